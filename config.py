@@ -0,0 +1,21 @@
+import os
+from datetime import timedelta
+
+# --- Configuration ---
+# Secrets loaded from GitHub Actions environment
+DESCO_ACCOUNT_NO = os.environ.get('DESCO_ACCOUNT_NO')
+BOT_TOKEN = os.environ.get('BOT_TOKEN')
+CHAT_ID = os.environ.get('CHAT_ID')
+
+YOUR_UTC_OFFSET = timedelta(hours=6) # Your local UTC offset (Asia/Dhaka, no DST)
+
+# --- ACTION NEEDED: Confirm the base API URL if necessary ---
+# This is the URL we found in the Network tab, up to the '?'
+# It includes '/api/tkdes/customer' which looks correct
+API_BASE_URL = "https://prepaid.desco.org.bd/api/tkdes/customer/getBalance"
+# Only visited if the API rejects a cookie-less request (401/403)
+INITIAL_PAGE_URL = 'https://prepaid.desco.org.bd/customer/#/customer-login' # URL of the page you first visit
+
+# Browser User-Agent sent with every request
+USER_AGENT = 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+# --- End Configuration ---
@@ -1,84 +1,119 @@
 import requests
-import os
-from datetime import datetime
-import zoneinfo # Requires Python 3.9+
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from datetime import datetime, timezone
+import time
+from collections import deque
 import re # Import the regular expression module
-
-# --- Configuration ---
-# Secrets loaded from GitHub Actions environment
-DESCO_ACCOUNT_NO = os.environ.get('DESCO_ACCOUNT_NO')
-BOT_TOKEN = os.environ.get('BOT_TOKEN')
-CHAT_ID = os.environ.get('CHAT_ID')
-
-YOUR_TIMEZONE = "Asia/Dhaka" # Your local timezone
-
-# --- ACTION NEEDED: Confirm the base API URL if necessary ---
-# This is the URL we found in the Network tab, up to the '?'
-# It includes '/api/tkdes/customer' which looks correct
-API_BASE_URL = "https://prepaid.desco.org.bd/api/tkdes/customer/getBalance"
-# We might still need the login page URL just to initialize a session cookie
-INITIAL_PAGE_URL = 'https://prepaid.desco.org.bd/customer/#/customer-login' # URL of the page you first visit
-# --- End Configuration ---
+try:
+    from orjson import loads as json_loads # Optional: faster JSON decoding if installed
+except ImportError:
+    from json import loads as json_loads
+
+from config import (DESCO_ACCOUNT_NO, BOT_TOKEN, CHAT_ID, YOUR_UTC_OFFSET,
+                    API_BASE_URL, INITIAL_PAGE_URL, USER_AGENT)
+
+# Request URLs are fixed for the whole run, so build them once at import
+DESCO_BALANCE_URL = f"{API_BASE_URL}?accountNo={DESCO_ACCOUNT_NO}&meterNo=" # Added empty meterNo param
+TELEGRAM_SEND_URL = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage" if BOT_TOKEN else None
+
+# (connect, read) timeouts in seconds. 3.05 is just over a multiple of the 3 s TCP
+# retransmit window. DESCO timeouts are not retried (see the Retry in __main__), so an
+# unreachable DESCO host fails after ~3 s and a hung one after ~13 s. The Telegram
+# adapter still retries failed connects, up to 4 x 3.05 s plus backoff.
+DESCO_TIMEOUT = (3.05, 10)
+TELEGRAM_TIMEOUT = (3.05, 7)
+
+# Fixed-offset zone: no tzdata file to read, and Dhaka has no DST to track
+_TZ = timezone(YOUR_UTC_OFFSET)
+
+# Picks the (possibly negative, comma-grouped) number out of a raw balance string
+_BALANCE_NUMBER = re.compile(r'-?\d[\d,]*(?:\.\d+)?')
+
+# Client-side throttle for Telegram so we never run into its 429 backoff:
+# at least _MIN_INTERVAL seconds between sends and at most _MAX_PER_MINUTE per minute
+_MIN_INTERVAL = 3.0
+_MAX_PER_MINUTE = 20
+_LAST_SEND = float('-inf') # No previous send, so the first message never waits
+_RECENT_SENDS = deque(maxlen=_MAX_PER_MINUTE) # monotonic timestamps of the last sends
 
 # --- Functions ---
 
-def send_telegram_message(balance_value):
-    """Sends the formatted message, adding a recharge reminder if balance is low."""
-    tz = zoneinfo.ZoneInfo(YOUR_TIMEZONE)
-    now = datetime.now(tz)
-    timestamp = now.strftime('%d-%b-%Y %I:%M %p')
-
-    # Format the balance nicely
-    balance_text = f"{balance_value:.2f} BDT" # Show 2 decimal places and currency
-    message = f"DESCO Balance Update ({timestamp}):\n\n{balance_text}"
+def _wait_for_telegram_slot():
+    """Sleeps just long enough to stay within the Telegram send limits."""
+    global _LAST_SEND
+    now = time.monotonic()
+    delay = _MIN_INTERVAL - (now - _LAST_SEND)
+    if len(_RECENT_SENDS) == _MAX_PER_MINUTE:
+        # The oldest of the last _MAX_PER_MINUTE sends must be a minute old
+        delay = max(delay, 60.0 - (now - _RECENT_SENDS[0]))
+    if delay > 0:
+        time.sleep(delay)
+    _LAST_SEND = time.monotonic()
+    _RECENT_SENDS.append(_LAST_SEND)
+
+def format_balance_message(balance_value, timestamp):
+    """Builds the balance message, adding a recharge reminder if balance is low.
+
+    balance_value is normally the float returned by the API; a raw balance string
+    (e.g. "1,234.50 Tk") is also accepted and the number is extracted from it first.
+    """
     recharge_reminder = "\n\n⚠️ Low Balance! Please recharge soon."
 
     try:
-        # Check if balance is low (now using the direct numeric value)
+        # Numbers from the API go straight through; only strings need the regex pass
+        if not isinstance(balance_value, (int, float)):
+            match = _BALANCE_NUMBER.search(balance_value)
+            if match is None:
+                raise ValueError(f"no number found in {balance_value!r}")
+            balance_value = float(match.group().replace(',', ''))
+
+        # Format the balance nicely
+        balance_text = f"{balance_value:.2f} BDT" # Show 2 decimal places and currency
+        message = f"DESCO Balance Update ({timestamp}):\n\n{balance_text}"
+
+        # Check if balance is low
         if balance_value < 100:
             message += recharge_reminder
             print("Low balance detected, adding recharge reminder.")
 
-    except Exception as e:
+    except (ValueError, TypeError) as e:
         print(f"Error during balance check/conversion: {e}")
-        # If conversion fails, send the raw value as fallback if needed (though it should be a number now)
+        # If conversion fails, send the raw value as fallback
         message = f"DESCO Balance Update ({timestamp}):\n\nCould not process balance value: {balance_value}"
 
+    return message
 
-    # Send the final message via Telegram API
-    api_url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-    try:
-        response = requests.post(api_url, json={'chat_id': CHAT_ID, 'text': message}, timeout=10)
-        response.raise_for_status()
-        print("Telegram message sent successfully.")
-    except Exception as e:
-        print(f"Error sending Telegram message: {e}")
+def send_telegram_message(message, session):
+    """Sends a message to the configured chat via the Telegram API."""
+    # 429 responses are retried by the Telegram adapter; any other failure is raised
+    _wait_for_telegram_slot()
+    response = session.post(TELEGRAM_SEND_URL, data={'chat_id': CHAT_ID, 'text': message}, timeout=TELEGRAM_TIMEOUT)
+    response.raise_for_status()
+    print("Telegram message sent successfully.")
 
-def get_desco_balance_api():
+def get_desco_balance_api(session):
     """Fetches DESCO balance directly via API."""
     balance = None # Use None to indicate failure, will convert to text later
-    session = requests.Session()
-    session.headers.update({'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'})
 
     try:
-        # Step 1: Visit the initial page to potentially get necessary cookies/session established
-        print(f"Visiting initial page: {INITIAL_PAGE_URL}...")
-        session.get(INITIAL_PAGE_URL, verify=False, timeout=15) # We don't care about the response, just need cookies potentially
-        print("Initial page visited.")
-
-        # Step 2: Construct the API URL with the account number
-        api_url = f"{API_BASE_URL}?accountNo={DESCO_ACCOUNT_NO}&meterNo=" # Added empty meterNo param
-        print(f"Fetching balance from API: {api_url}...")
-
-        # Step 3: Make the GET request to the API endpoint using the same session
-        api_response = session.get(api_url, verify=False, timeout=15)
+        print(f"Fetching balance from API: {DESCO_BALANCE_URL}...")
+
+        # Step 1: Call the API directly; only if it refuses us do we visit the
+        # initial page to pick up session cookies and try once more
+        api_response = session.get(DESCO_BALANCE_URL, timeout=DESCO_TIMEOUT)
+        if api_response.status_code in (401, 403):
+            print(f"API returned {api_response.status_code}, visiting initial page: {INITIAL_PAGE_URL}...")
+            session.get(INITIAL_PAGE_URL, timeout=DESCO_TIMEOUT) # We don't care about the response, just need cookies potentially
+            print("Initial page visited, retrying API call.")
+            api_response = session.get(DESCO_BALANCE_URL, timeout=DESCO_TIMEOUT)
         api_response.raise_for_status() # Check for HTTP errors (like 4xx, 5xx)
 
-        # Step 4: Parse the JSON response
-        json_data = api_response.json()
+        # Step 2: Parse the JSON response
+        json_data = json_loads(api_response.content)
         print(f"API Response JSON: {json_data}")
 
-        # Step 5: Extract the balance
+        # Step 3: Extract the balance
         if json_data.get("code") == 200 and "data" in json_data and "balance" in json_data["data"]:
             balance = json_data["data"]["balance"]
             # Ensure balance is a number (float)
@@ -108,8 +143,6 @@ def get_desco_balance_api():
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
         balance = f"Script Error: {e}"
-    finally:
-        session.close()
 
     # Return the numeric balance or an error string
     return balance
@@ -120,23 +153,35 @@ if __name__ == "__main__":
         print("Error: Missing one or more secrets (DESCO_ACCOUNT_NO, BOT_TOKEN, CHAT_ID). Check GitHub Secrets.")
     else:
         print("Starting DESCO balance check via API...")
-        current_balance = get_desco_balance_api()
-
-        # Check if we got a number or an error string
-        if isinstance(current_balance, (int, float)):
-            send_telegram_message(current_balance) # Pass the number directly
-        else:
-            # If it's an error string, send it as is
-            tz = zoneinfo.ZoneInfo(YOUR_TIMEZONE)
-            now = datetime.now(tz)
-            timestamp = now.strftime('%d-%b-%Y %I:%M %p')
-            error_message = f"DESCO Balance Update ({timestamp}):\n\nFailed to retrieve balance.\nError: {current_balance}"
-            # Need to call the Telegram send function directly for errors
-            api_url = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
-            try:
-                requests.post(api_url, json={'chat_id': CHAT_ID, 'text': error_message}, timeout=10)
-                print("Error message sent to Telegram.")
-            except Exception as e_send:
-                print(f"Failed to send error message to Telegram: {e_send}")
-
-        print("Script finished.")
+        # One session for the whole run so the Telegram POST reuses pooled connections
+        SESSION = requests.Session()
+        SESSION.headers.update({'User-Agent': USER_AGENT})
+        # Retry rate limits and transient server errors on the (idempotent) DESCO GETs
+        # with exponential backoff. Connect and read timeouts are not retried, so a dead
+        # or hung host fails after a single timeout; the worst case per GET is four
+        # 429/5xx attempts of up to DESCO_TIMEOUT each plus ~3.5 s of backoff.
+        retries = Retry(total=3, connect=0, read=0, backoff_factor=0.5,
+                        status_forcelist=[429, 500, 502, 503, 504])
+        SESSION.mount('https://', HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retries))
+        # sendMessage is not idempotent: after a read timeout or a 5xx Telegram may already
+        # have delivered the message, so only retry the POST on 429 and never after a read
+        telegram_retries = Retry(total=3, read=0, backoff_factor=0.5, status_forcelist=[429],
+                                 allowed_methods=frozenset(['POST']))
+        SESSION.mount('https://api.telegram.org/', HTTPAdapter(max_retries=telegram_retries))
+
+        try:
+            current_balance = get_desco_balance_api(SESSION)
+
+            timestamp = datetime.now(_TZ).strftime('%d-%b-%Y %I:%M %p')
+
+            # Check if we got a number or an error string
+            if isinstance(current_balance, (int, float)):
+                message = format_balance_message(current_balance, timestamp) # Pass the number directly
+            else:
+                # If it's an error string, send it as is
+                message = f"DESCO Balance Update ({timestamp}):\n\nFailed to retrieve balance.\nError: {current_balance}"
+
+            send_telegram_message(message, session=SESSION)
+        finally:
+            SESSION.close()
+            print("Script finished.")